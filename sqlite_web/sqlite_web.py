@@ -2,20 +2,17 @@
 
 import base64
 import datetime
-import hashlib
+import decimal
 import logging
 import math
 import operator
-import optparse
 import os
 import re
 import sys
 import threading
 import time
-import webbrowser
 from collections import namedtuple, OrderedDict
 from functools import wraps
-from getpass import getpass
 from io import TextIOWrapper
 from logging.handlers import WatchedFileHandler
 
@@ -26,7 +23,7 @@ if sys.version_info[0] == 2:
     decode_handler = 'replace'
     numeric = (int, long, float)
     unicode_type = unicode
-    from StringIO import StringIO
+    from Queue import Full, Queue
 else:
     PY2 = False
     binary_types = (bytes, bytearray)
@@ -34,15 +31,22 @@ else:
     numeric = (int, float)
     unicode_type = str
     from functools import reduce
-    from io import StringIO
+    from queue import Full, Queue
 
 try:
     from flask import (
-        Flask, abort, flash, jsonify, make_response, redirect,
-        render_template, request, session, url_for)
+        Flask, Response, abort, flash, jsonify, redirect, render_template,
+        request, session, url_for)
 except ImportError:
     raise RuntimeError('Unable to import flask module. Install by running '
                        'pip install flask')
+try:
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+except ImportError:
+    from werkzeug.wsgi import DispatcherMiddleware  # Werkzeug < 0.15.
+from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import ClosingIterator
+
 try:
     from markupsafe import Markup, escape
 except ImportError:
@@ -63,6 +67,11 @@ else:
         formatter = formatters.HtmlFormatter(linenos=False)
         return highlight(data, lexer, formatter)
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 try:
     from peewee import __version__
     peewee_version = tuple([int(p) for p in __version__.split('.')])
@@ -79,7 +88,9 @@ from peewee import *
 from peewee import IndexMetadata
 from peewee import sqlite3
 from playhouse.dataset import DataSet
+from playhouse.dataset import JSONImporter
 from playhouse.migrate import migrate
+from playhouse.pool import PooledSqliteDatabase
 
 
 CUR_DIR = os.path.realpath(os.path.dirname(__file__))
@@ -104,73 +115,244 @@ TriggerMetadata = namedtuple('TriggerMetadata', ('name', 'sql'))
 
 ViewMetadata = namedtuple('ViewMetadata', ('name', 'sql'))
 
+# Shadow tables created alongside full-text search virtual tables.
+virtual_table_suffixes = ('content', 'docsize', 'segdir', 'segments', 'stat')
+
+def _skip_whitespace(sql, idx):
+    while idx < len(sql) and sql[idx].isspace():
+        idx += 1
+    return idx
+
+def instead_of_operations(trigger_sql):
+    # Linear scan for "INSTEAD OF <op>", avoids backtracking in the regex
+    # engine on large or pathological trigger bodies.
+    sql = trigger_sql.upper()
+    operations = set()
+    idx = sql.find('INSTEAD')
+    while idx > 0:
+        if sql[idx - 1].isspace():
+            end = _skip_whitespace(sql, idx + 7)
+            if end > idx + 7 and sql.startswith('OF', end):
+                start = _skip_whitespace(sql, end + 2)
+                if start > end + 2:
+                    for op in ('INSERT', 'UPDATE', 'DELETE'):
+                        if sql.startswith(op, start) and \
+                           sql[start + 6:start + 7].isspace():
+                            operations.add(op.lower())
+        idx = sql.find('INSTEAD', idx + 7)
+    return operations
+
 #
 # Database helpers.
 #
 
+def schema_cached(fn):
+    # Cache the result of a metadata query until the schema is invalidated.
+    @wraps(fn)
+    def inner(self, *args):
+        key = (fn.__name__,) + args
+        try:
+            return self._schema_cache[key]
+        except KeyError:
+            result = self._schema_cache[key] = fn(self, *args)
+            return result
+    return inner
+
+class StreamingJSONImporter(JSONImporter):
+    # Decode the top-level array of the import file one object at a time
+    # using ijson, instead of loading the entire file with json.load().
+    def load(self, file_obj, **kwargs):
+        file_obj = getattr(file_obj, 'buffer', file_obj)
+        # Newer versions of playhouse also decode blobs and ISO-8601 dates.
+        import_value = getattr(self, '_import_value', None)
+        if import_value is None:
+            import_value = lambda field, value: field.python_value(value)
+
+        count = 0
+        for row in ijson.items(file_obj, 'item', use_float=True):
+            obj = {}
+            for key in row:
+                field = self.columns.get(key)
+                if field is not None:
+                    obj[key] = import_value(field, row[key])
+                elif not self.strict:
+                    obj[key] = row[key]
+
+            if obj:
+                self.table.insert(**obj)
+                count += 1
+
+        return count
+
+class BatchInsertTable(object):
+    # Stands in for a dataset Table when importing. Rows are buffered and
+    # written using multi-row INSERT statements. Rows within a batch always
+    # share the same set of keys, and the first row of each batch is inserted
+    # through the wrapped Table so any new columns are added.
+    def __init__(self, table, batch_size=200):
+        self.table = table
+        self.name = table.name
+        self.model_class = table.model_class
+        self.batch_size = batch_size
+        self._keys = None
+        self._rows = []
+
+    def insert(self, **data):
+        keys = set(data)
+        if keys != self._keys:
+            self.flush()
+            self._keys = keys
+        self._rows.append(data)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        self.table.insert(**rows[0])
+        if len(rows) > 1:
+            # Stay below SQLite's default limit of 999 bound parameters.
+            model = self.table.model_class
+            batch_size = max(1, 999 // len(rows[0]))
+            for batch in chunked(rows[1:], batch_size):
+                model.insert_many(batch).execute()
+
 class SqliteDataSet(DataSet):
-    @property
-    def filename(self):
-        db_file = dataset._database.database
+    def __init__(self, *args, **kwargs):
+        self._schema_cache = {}
+        self._schema_version = None
+        self._stat_result = None
+        self._stat_time = 0
+        super(SqliteDataSet, self).__init__(*args, **kwargs)
+
+        # The database path does not change once opened, so resolve it once.
+        db_file = self._database.database
+        self._is_readonly = db_file.endswith('?mode=ro')
         if db_file.startswith('file:'):
             db_file = db_file[5:]
-        return os.path.realpath(db_file.rsplit('?', 1)[0])
+        self._filename = os.path.realpath(db_file.rsplit('?', 1)[0])
+        self._base_name = os.path.basename(self._filename)
+
+    def check_schema(self):
+        # The schema version is stored in the database header and changes
+        # whenever the schema is modified, including by other processes.
+        version = self.query('PRAGMA schema_version').fetchone()[0]
+        if version != self._schema_version:
+            self.invalidate_schema()
+            self._schema_version = version
+
+    def invalidate_schema(self):
+        self._schema_cache.clear()
+
+    def thaw_batched(self, table, format='csv', file_obj=None, strict=False,
+                     batch_size=200):
+        # Like thaw(), but rows are inserted in batches rather than one
+        # statement per row.
+        batch_table = BatchInsertTable(self[table], batch_size)
+        importer = self._import_formats[format](batch_table, strict=strict)
+        count = importer.load(file_obj)
+        batch_table.flush()
+        return count
+
+    def get_import_formats(self):
+        formats = super(SqliteDataSet, self).get_import_formats()
+        if ijson is not None:
+            formats['json'] = StreamingJSONImporter
+        return formats
+
+    def refresh_cache(self, table):
+        # Regenerate the table's model only if the schema has changed since
+        # it was last introspected.
+        key = ('refresh_cache', table)
+        if key not in self._schema_cache:
+            self.update_cache(table)
+            self._schema_cache[key] = True
+
+    @property
+    @schema_cached
+    def tables(self):
+        return super(SqliteDataSet, self).tables
+
+    @property
+    def filename(self):
+        return self._filename
 
     @property
     def is_readonly(self):
-        db_file = dataset._database.database
-        return db_file.endswith('?mode=ro')
+        return self._is_readonly
 
     @property
     def base_name(self):
-        return os.path.basename(self.filename)
+        return self._base_name
+
+    def _stat(self):
+        # Share a single stat() call between the properties below, which are
+        # typically all accessed while rendering the same page.
+        now = time.time()
+        if self._stat_result is None or now - self._stat_time > 1:
+            self._stat_result = os.stat(self._filename)
+            self._stat_time = now
+        return self._stat_result
 
     @property
     def created(self):
-        stat = os.stat(self.filename)
-        return datetime.datetime.fromtimestamp(stat.st_ctime)
+        return datetime.datetime.fromtimestamp(self._stat().st_ctime)
 
     @property
     def modified(self):
-        stat = os.stat(self.filename)
-        return datetime.datetime.fromtimestamp(stat.st_mtime)
+        return datetime.datetime.fromtimestamp(self._stat().st_mtime)
 
     @property
     def size_on_disk(self):
-        stat = os.stat(self.filename)
-        return stat.st_size
+        return self._stat().st_size
 
+    @schema_cached
     def get_indexes(self, table):
         return dataset._database.get_indexes(table)
 
+    @schema_cached
     def get_all_indexes(self):
         cursor = self.query(
             'SELECT name, sql FROM sqlite_master '
             'WHERE type = ? ORDER BY name',
             ('index',))
         return [IndexMetadata(row[0], row[1], None, None, None)
-                for row in cursor.fetchall()]
+                for row in cursor]
+
+    @schema_cached
+    def get_object_counts(self):
+        cursor = self.query(
+            'SELECT type, COUNT(*) FROM sqlite_master '
+            'WHERE type IN (?, ?, ?) GROUP BY type',
+            ('index', 'trigger', 'view'))
+        return dict(cursor)
 
+    @schema_cached
     def get_columns(self, table):
         return dataset._database.get_columns(table)
 
+    @schema_cached
     def get_foreign_keys(self, table):
         return dataset._database.get_foreign_keys(table)
 
+    @schema_cached
     def get_triggers(self, table):
         cursor = self.query(
             'SELECT name, sql FROM sqlite_master '
             'WHERE type = ? AND tbl_name = ?',
             ('trigger', table))
-        return [TriggerMetadata(*row) for row in cursor.fetchall()]
+        return [TriggerMetadata(*row) for row in cursor]
 
+    @schema_cached
     def get_all_triggers(self):
         cursor = self.query(
             'SELECT name, sql FROM sqlite_master '
             'WHERE type = ? ORDER BY name',
             ('trigger',))
-        return [TriggerMetadata(*row) for row in cursor.fetchall()]
+        return [TriggerMetadata(*row) for row in cursor]
 
+    @schema_cached
     def get_table_sql(self, table):
         if not table:
             return
@@ -183,6 +365,7 @@ class SqliteDataSet(DataSet):
         if res is not None:
             return res[0]
 
+    @schema_cached
     def get_view(self, name):
         cursor = self.query(
             'SELECT name, sql FROM sqlite_master '
@@ -191,44 +374,49 @@ class SqliteDataSet(DataSet):
         if res is not None:
             return ViewMetadata(*res)
 
+    @schema_cached
     def get_all_views(self):
         cursor = self.query(
             'SELECT name, sql FROM sqlite_master '
             'WHERE type = ? ORDER BY name',
             ('view',))
-        return [ViewMetadata(*row) for row in cursor.fetchall()]
+        return [ViewMetadata(*row) for row in cursor]
 
+    @schema_cached
     def get_virtual_tables(self):
+        # SQLite normalizes the leading keywords of the stored statement, so a
+        # prefix check is sufficient and avoids evaluating LIKE for each row.
         cursor = self.query(
-            'SELECT name FROM sqlite_master '
-            'WHERE type = ? AND sql LIKE ? '
-            'ORDER BY name',
-            ('table', 'CREATE VIRTUAL TABLE%'))
-        return set([row[0] for row in cursor.fetchall()])
+            'SELECT name, sql FROM sqlite_master WHERE type = ?',
+            ('table',))
+        return set(name for name, sql in cursor
+                   if sql and sql.startswith('CREATE VIRTUAL TABLE'))
 
+    @schema_cached
     def get_corollary_virtual_tables(self):
         virtual_tables = self.get_virtual_tables()
-        suffixes = ['content', 'docsize', 'segdir', 'segments', 'stat']
+        if not virtual_tables:
+            return set()
         return set(
-            '%s_%s' % (virtual_table, suffix) for suffix in suffixes
+            '%s_%s' % (virtual_table, suffix)
+            for suffix in virtual_table_suffixes
             for virtual_table in virtual_tables)
 
+    @schema_cached
     def is_view(self, name):
         cursor = self.query(
             'SELECT name FROM sqlite_master '
             'WHERE type = ? AND name = ?', ('view', name))
         return cursor.fetchone() is not None
 
+    @schema_cached
     def view_operations(self, name):
         cursor = self.query(
             'SELECT sql FROM sqlite_master WHERE type=? AND tbl_name=?',
             ('trigger', name))
-        triggers = [t for t, in cursor.fetchall()]
-        rgx = re.compile(r'CREATE\s+TRIGGER.+?\sINSTEAD\s+OF\s+'
-                         '(INSERT|UPDATE|DELETE)\s', re.I)
         operations = set()
-        for trigger in triggers:
-            operations.update([op.lower() for op in rgx.findall(trigger)])
+        for trigger, in cursor:
+            operations.update(instead_of_operations(trigger))
 
         return operations
 
@@ -238,7 +426,10 @@ class SqliteDataSet(DataSet):
 
 @app.route('/')
 def index():
-    return render_template('index.html', sqlite=sqlite3)
+    return render_template(
+        'index.html',
+        object_counts=dataset.get_object_counts(),
+        sqlite=sqlite3)
 
 @app.route('/login/', methods=['GET', 'POST'])
 def login():
@@ -260,6 +451,7 @@ def _query_view(template, table=None):
     data = []
     data_description = error = row_count = sql = None
     ordering = None
+    truncated = False
 
     sql = qsql = request.args.get('sql') or ''
 
@@ -278,6 +470,10 @@ def _query_view(template, table=None):
         direction = 'DESC' if ordering < 0 else 'ASC'
         qsql = ('SELECT * FROM (%s) AS _ ORDER BY %d %s' %
                 (sql.rstrip(' ;'), abs(ordering), direction))
+        if not export_format:
+            # Allow SQLite to use a bounded top-N sort rather than sorting
+            # the entire result set.
+            qsql += ' LIMIT %d' % (app.config['MAX_RESULT_SIZE'] + 1)
     else:
         ordering = None
 
@@ -291,17 +487,28 @@ def _query_view(template, table=None):
     if qsql:
         if export_format:
             query = model_class.raw(qsql).dicts()
-            return export(query, export_format, table)
-
-        try:
-            cursor = dataset.query(qsql)
-        except Exception as exc:
-            error = str(exc)
-            app.logger.exception('Error in user-submitted query.')
+            try:
+                return export(query, export_format, table)
+            except Exception as exc:
+                error = str(exc)
+                app.logger.exception('Error generating export.')
         else:
-            data = cursor.fetchall()[:app.config['MAX_RESULT_SIZE']]
-            data_description = cursor.description
-            row_count = cursor.rowcount
+            try:
+                cursor = dataset.query(qsql)
+            except Exception as exc:
+                error = str(exc)
+                app.logger.exception('Error in user-submitted query.')
+            else:
+                # Fetch one extra row to detect whether results were truncated.
+                max_result_size = app.config['MAX_RESULT_SIZE']
+                data = cursor.fetchmany(max_result_size + 1)
+                truncated = len(data) > max_result_size
+                data = data[:max_result_size]
+                data_description = cursor.description
+                row_count = cursor.rowcount
+
+        # The query may have modified the schema.
+        dataset.check_schema()
 
     return render_template(
         template,
@@ -314,7 +521,8 @@ def _query_view(template, table=None):
         row_count=row_count,
         sql=sql,
         table=table,
-        table_sql=dataset.get_table_sql(table))
+        table_sql=dataset.get_table_sql(table),
+        truncated=truncated)
 
 @app.route('/query/', methods=['GET'])
 def generic_query():
@@ -343,6 +551,8 @@ def table_create():
     except Exception as exc:
         flash('Error: %s' % str(exc), 'danger')
         app.logger.exception('Error attempting to create table.')
+    else:
+        dataset.invalidate_schema()
     return redirect(url_for('table_import', table=table))
 
 @app.route('/<table>/')
@@ -367,24 +577,25 @@ def get_request_data():
         return request.form
     return request.args
 
+class JsonField(TextField):
+    field_type = 'JSON'
+
+column_mapping = OrderedDict((
+    ('TEXT', TextField),
+    ('INTEGER', IntegerField),
+    ('REAL', FloatField),
+    ('BLOB', BlobField),
+    ('JSON', JsonField),
+    ('BOOL', BooleanField),
+    ('DATETIME', DateTimeField),
+    ('DATE', DateField),
+    ('DECIMAL', DecimalField),
+    ('TIME', TimeField),
+    ('VARCHAR', CharField)))
+
 @app.route('/<table>/add-column/', methods=['GET', 'POST'])
 @require_table
 def add_column(table):
-    class JsonField(TextField):
-        field_type = 'JSON'
-    column_mapping = OrderedDict((
-        ('TEXT', TextField),
-        ('INTEGER', IntegerField),
-        ('REAL', FloatField),
-        ('BLOB', BlobField),
-        ('JSON', JsonField),
-        ('BOOL', BooleanField),
-        ('DATETIME', DateTimeField),
-        ('DATE', DateField),
-        ('DECIMAL', DecimalField),
-        ('TIME', TimeField),
-        ('VARCHAR', CharField)))
-
     request_data = get_request_data()
     col_type = request_data.get('type')
     name = request_data.get('name', '')
@@ -402,6 +613,7 @@ def add_column(table):
                       'danger')
                 app.logger.exception('Error attempting to add column.')
             else:
+                dataset.invalidate_schema()
                 flash('Column "%s" was added successfully!' % name, 'success')
                 dataset.update_cache(table)
                 return redirect(url_for('table_structure', table=table))
@@ -422,7 +634,7 @@ def drop_column(table):
     request_data = get_request_data()
     name = request_data.get('name', '')
     columns = dataset.get_columns(table)
-    column_names = [column.name for column in columns]
+    column_names = {column.name for column in columns}
 
     if request.method == 'POST':
         if name in column_names:
@@ -433,6 +645,7 @@ def drop_column(table):
                       'danger')
                 app.logger.exception('Error attempting to drop column.')
             else:
+                dataset.invalidate_schema()
                 flash('Column "%s" was dropped successfully!' % name, 'success')
                 dataset.update_cache(table)
                 return redirect(url_for('table_structure', table=table))
@@ -454,7 +667,7 @@ def rename_column(table):
     rename_to = request_data.get('rename_to', '')
 
     columns = dataset.get_columns(table)
-    column_names = [column.name for column in columns]
+    column_names = {column.name for column in columns}
 
     if request.method == 'POST':
         if (rename in column_names) and (rename_to not in column_names):
@@ -465,6 +678,7 @@ def rename_column(table):
                       'danger')
                 app.logger.exception('Error attempting to rename column.')
             else:
+                dataset.invalidate_schema()
                 flash('Column "%s" was renamed successfully!' % rename, 'success')
                 dataset.update_cache(table)
                 return redirect(url_for('table_structure', table=table))
@@ -501,6 +715,7 @@ def add_index(table):
                 flash('Error attempting to create index: %s' % exc, 'danger')
                 app.logger.exception('Error attempting to create index.')
             else:
+                dataset.invalidate_schema()
                 flash('Index created successfully.', 'success')
                 return redirect(url_for('table_structure', table=table))
         else:
@@ -519,7 +734,7 @@ def drop_index(table):
     request_data = get_request_data()
     name = request_data.get('name', '')
     indexes = dataset.get_indexes(table)
-    index_names = [index.name for index in indexes]
+    index_names = {index.name for index in indexes}
 
     if request.method == 'POST':
         if name in index_names:
@@ -529,6 +744,7 @@ def drop_index(table):
                 flash('Error attempting to drop index: %s' % exc, 'danger')
                 app.logger.exception('Error attempting to drop index.')
             else:
+                dataset.invalidate_schema()
                 flash('Index "%s" was dropped successfully!' % name, 'success')
                 return redirect(url_for('table_structure', table=table))
         else:
@@ -547,7 +763,7 @@ def drop_trigger(table):
     request_data = get_request_data()
     name = request_data.get('name', '')
     triggers = dataset.get_triggers(table)
-    trigger_names = [trigger.name for trigger in triggers]
+    trigger_names = {trigger.name for trigger in triggers}
 
     if request.method == 'POST':
         if name in trigger_names:
@@ -557,6 +773,7 @@ def drop_trigger(table):
                 flash('Error attempting to drop trigger: %s' % exc, 'danger')
                 app.logger.exception('Error attempting to drop trigger.')
             else:
+                dataset.invalidate_schema()
                 flash('Trigger "%s" was dropped successfully!' % name, 'success')
                 return redirect(url_for('table_structure', table=table))
         else:
@@ -577,7 +794,7 @@ def table_content(table):
     if page_number == 'last': page_number = '1000000'
     page_number = int(page_number) if page_number.isdigit() else 1
 
-    dataset.update_cache(table)
+    dataset.refresh_cache(table)
     ds_table = dataset[table]
     model = ds_table.model_class
 
@@ -602,8 +819,11 @@ def table_content(table):
 
     session['%s.last_viewed' % table] = (page_number, ordering)
 
-    field_names = ds_table.columns
-    columns = [f.column_name for f in ds_table.model_class._meta.sorted_fields]
+    field_names = []
+    columns = []
+    for field in model._meta.sorted_fields:
+        field_names.append(field.name)
+        columns.append(field.column_name)
 
     return render_template(
         'table_content.html',
@@ -621,29 +841,68 @@ def table_content(table):
         total_pages=total_pages,
         total_rows=total_rows)
 
+boolean_values = frozenset(('1', '0', 'true', 'false', 't', 'f'))
+true_values = frozenset(('1', 't', 'true'))
+
+def _validate_integer(value, lower):
+    if not value.isdigit():
+        return value, 'Value is not a number.'
+    return value, None
+
+def _validate_float(value, lower):
+    try:
+        _ = float(value)
+    except Exception:
+        return value, 'Value is not a numeric/real.'
+    return value, None
+
+def _validate_boolean(value, lower):
+    if lower not in boolean_values:
+        return value, 'Value must be 1, 0, true, false, t or f.'
+    return lower in true_values, None
+
+def _validate_blob(value, lower):
+    try:
+        return base64.b64decode(value), None
+    except Exception as exc:
+        return value, 'Value must be base64-encoded binary data.'
+
+field_validators = {
+    IntegerField: _validate_integer,
+    FloatField: _validate_float,
+    BooleanField: _validate_boolean,
+    BlobField: _validate_blob,
+}
+_validator_cache = {}
+
+def get_field_validator(field_class):
+    # Resolve the validator for a field class once, honoring subclasses
+    # such as BigIntegerField or DoubleField.
+    try:
+        return _validator_cache[field_class]
+    except KeyError:
+        pass
+    validator = None
+    for base in field_class.__mro__:
+        if base in field_validators:
+            validator = field_validators[base]
+            break
+    _validator_cache[field_class] = validator
+    return validator
+
 def minimal_validate_field(field, value):
-    if value.lower().strip() == 'null':
+    lower = value.lower()
+    if lower.strip() == 'null':
         value = None
     if value is None and not field.null:
         return 'NULL', 'Column does not allow NULL values.'
     if value is None:
         return None, None
-    if isinstance(field, IntegerField) and not value.isdigit():
-        return value, 'Value is not a number.'
-    elif isinstance(field, FloatField):
-        try:
-            _ = float(value)
-        except Exception:
-            return value, 'Value is not a numeric/real.'
-    elif isinstance(field, BooleanField):
-        if value.lower() not in ('1', '0', 'true', 'false', 't', 'f'):
-            return value, 'Value must be 1, 0, true, false, t or f.'
-        value = True if value.lower() in ('1', 't', 'true') else False
-    elif isinstance(field, BlobField):
-        try:
-            value = base64.b64decode(value)
-        except Exception as exc:
-            return value, 'Value must be base64-encoded binary data.'
+    validator = get_field_validator(type(field))
+    if validator is not None:
+        value, err = validator(value, lower)
+        if err:
+            return value, err
     try:
         field.db_value(value)
     except Exception as exc:
@@ -654,31 +913,29 @@ def minimal_validate_field(field, value):
 @app.route('/<table>/insert/', methods=['GET', 'POST'])
 @require_table
 def table_insert(table):
-    dataset.update_cache(table)
+    dataset.refresh_cache(table)
     model = dataset[table].model_class
 
     columns = []
-    col_dict = {}
-    row = {}
+    fields = {}
     for column in dataset.get_columns(table):
         field = model._meta.columns[column.name]
         if isinstance(field, AutoField):
             continue
         columns.append(column)
-        col_dict[column.name] = column
-        row[column.name] = ''
+        fields[column.name] = field
+    row = dict.fromkeys(fields, '')
 
     edited = set()
     errors = {}
     if request.method == 'POST':
         insert = {}
         for key, value in request.form.items():
-            if key not in col_dict: continue
-            column = col_dict[key]
-            edited.add(column.name)
-            row[column.name] = value
+            if key not in fields: continue
+            field = fields[key]
+            edited.add(key)
+            row[key] = value
 
-            field = model._meta.columns[column.name]
             value, err = minimal_validate_field(field, value)
             if err:
                 errors[key] = err
@@ -704,7 +961,7 @@ def table_insert(table):
         else:
             flash('No data was specified to be inserted.', 'warning')
     else:
-        edited = set(col_dict)  # Make all fields editable on load.
+        edited = set(fields)  # Make all fields editable on load.
 
     return render_template(
         'table_insert.html',
@@ -715,6 +972,10 @@ def table_insert(table):
         row=row,
         table=table)
 
+# Number of bytes of a blob shown when editing a row. Encodes to 1024
+# base64 characters.
+blob_preview_size = 768
+
 def redirect_to_previous(table):
     page_ordering = session.get('%s.last_viewed' % table)
     if not page_ordering:
@@ -730,7 +991,7 @@ def redirect_to_previous(table):
 @app.route('/<table>/update/<pk>/', methods=['GET', 'POST'])
 @require_table
 def table_update(table, pk):
-    dataset.update_cache(table)
+    dataset.refresh_cache(table)
     model = dataset[table].model_class
     table_pk = model._meta.primary_key
     if not table_pk:
@@ -742,37 +1003,41 @@ def table_update(table, pk):
 
     expr = decode_pk(model, pk)
     try:
-        obj = model.get(expr)
+        obj = model.select().where(expr).dicts().get()
     except model.DoesNotExist:
         pk_repr = pk_display(table_pk, pk)
         flash('Could not fetch row with primary-key %s.' % str(pk_repr), 'danger')
         return redirect(url_for('table_content', table=table))
 
     columns = dataset.get_columns(table)
-    col_dict = {}
+    fields = {c.name: model._meta.columns[c.name] for c in columns}
     row = {}
+    truncated = set()
     for column in columns:
-        value = getattr(obj, column.name)
+        value = obj[column.name]
         if value is None:
             row[column.name] = None
         elif column.data_type.lower() == 'blob':
+            # Only encode a prefix of large blobs for display.
+            if len(value) > blob_preview_size:
+                truncated.add(column.name)
+                value = value[:blob_preview_size]
             row[column.name] = base64.b64encode(value).decode('utf8')
         else:
             row[column.name] = value
 
-        col_dict[column.name] = column
-
     edited = set()
     errors = {}
     if request.method == 'POST':
         update = {}
         for key, value in request.form.items():
-            if key not in col_dict: continue
-            column = col_dict[key]
-            edited.add(column.name)
-            row[column.name] = value
+            if key not in fields: continue
+            edited.add(key)
+            if key in truncated and value == row[key]:
+                continue  # Do not overwrite a blob with its preview.
+            row[key] = value
 
-            field = model._meta.columns[column.name]
+            field = fields[key]
             value, err = minimal_validate_field(field, value)
             if err:
                 errors[key] = err
@@ -804,12 +1069,13 @@ def table_update(table, pk):
         pk=pk,
         row=row,
         table=table,
-        table_pk=model._meta.primary_key)
+        table_pk=model._meta.primary_key,
+        truncated=truncated)
 
 @app.route('/<table>/delete/<pk>/', methods=['GET', 'POST'])
 @require_table
 def table_delete(table, pk):
-    dataset.update_cache(table)
+    dataset.refresh_cache(table)
     model = dataset[table].model_class
     table_pk = model._meta.primary_key
     if not table_pk:
@@ -852,8 +1118,85 @@ def table_delete(table, pk):
 def table_query(table):
     return _query_view('table_query.html', table)
 
+class ChunkQueue(object):
+    # File-like object that collects writes into chunks and hands them to a
+    # consumer in another thread. The queue is bounded, so the producer is
+    # blocked while the client is slow to read.
+    def __init__(self, chunk_size=65536, maxsize=16):
+        self.chunk_size = chunk_size
+        self.cancelled = False
+        self.error = None
+        self.started = False
+        self._buffer = []
+        self._buffer_size = 0
+        self._queue = Queue(maxsize)
+
+    def _put(self, item):
+        while not self.cancelled:
+            try:
+                self._queue.put(item, timeout=1)
+            except Full:
+                continue
+            else:
+                return
+        raise IOError('Export was cancelled.')
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._put(''.join(self._buffer))
+            self.started = True
+            self._buffer = []
+            self._buffer_size = 0
+
+    def close(self):
+        self.flush()
+        self._put(None)
+
+    def discard(self):
+        self._buffer = []
+        self._buffer_size = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def get(self):
+        return self._queue.get()
+
+    def read(self, first):
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            chunk = self._queue.get()
+
+def _freeze_to_queue(query, export_format, chunk_queue, kwargs):
+    try:
+        dataset.freeze(query, export_format, file_obj=chunk_queue, **kwargs)
+    except Exception as exc:
+        if not chunk_queue.started:
+            # Nothing was sent yet, so drop the partial output and let the
+            # request thread raise (and log) the error.
+            chunk_queue.discard()
+            chunk_queue.error = exc
+        elif not chunk_queue.cancelled:
+            app.logger.exception('Error generating export.')
+    finally:
+        # Release this thread's connection back to the pool.
+        if not dataset._database.is_closed():
+            dataset._database.close()
+        try:
+            chunk_queue.close()
+        except IOError:
+            pass  # The client disconnected.
+
+export_filename_re = re.compile(r'[^\w\d\-\.]+')
+
 def export(query, export_format, table=None):
-    buf = StringIO()
     if export_format == 'json':
         kwargs = {'indent': 2}
         filename = 'export.json'
@@ -867,14 +1210,32 @@ def export(query, export_format, table=None):
         filename = '%s-%s' % (table, filename)
 
     # Avoid any special chars in export filename.
-    filename = re.sub(r'[^\w\d\-\.]+', '', filename)
+    filename = export_filename_re.sub('', filename)
+
+    # Generate the export in a background thread and stream it to the client
+    # as it is produced, rather than buffering the entire file in memory.
+    chunk_queue = ChunkQueue()
+    thread = threading.Thread(
+        target=_freeze_to_queue,
+        args=(query, export_format, chunk_queue, kwargs))
+    thread.daemon = True
+    thread.start()
 
-    dataset.freeze(query, export_format, file_obj=buf, **kwargs)
+    # Wait for the first chunk, so that errors executing the query are raised
+    # here rather than producing an empty 200 response.
+    first = chunk_queue.get()
+    if first is None and chunk_queue.error is not None:
+        raise chunk_queue.error
 
-    response_data = buf.getvalue()
-    response = make_response(response_data)
-    response.headers['Content-Length'] = len(response_data)
-    response.headers['Content-Type'] = mimetype
+    if request.method == 'HEAD':
+        # The body is not sent, so stop generating it.
+        chunk_queue.cancel()
+        body = ()
+    else:
+        # The producer is also cancelled if the response is closed before
+        # the body has been read.
+        body = ClosingIterator(chunk_queue.read(first), chunk_queue.cancel)
+    response = Response(body, mimetype=mimetype)
     response.headers['Content-Disposition'] = 'attachment; filename="%s"' % (
         filename)
     response.headers['Expires'] = 0
@@ -897,7 +1258,7 @@ def table_export(table):
             fields = [model._meta.columns[c] for c in selected]
             query = model.select(*fields).dicts()
             try:
-                return export(table, query, export_format)
+                return export(query, export_format, table)
             except Exception as exc:
                 flash('Error generating export: %s' % exc, 'danger')
                 app.logger.exception('Error generating export.')
@@ -927,34 +1288,33 @@ def table_import(table):
             else:
                 format = 'csv'
 
-            # Here we need to translate the file stream. Werkzeug uses a
-            # spooled temporary file opened in wb+ mode, which is not
-            # compatible with Python's CSV module. We'd need to reach pretty
-            # far into Flask's internals to modify this behavior, so instead
-            # we'll just translate the stream into utf8-decoded unicode.
-            if not PY2:
-                try:
-                    stream = TextIOWrapper(file_obj, encoding='utf8')
-                except AttributeError:
-                    # The SpooledTemporaryFile used by werkzeug does not
-                    # implement an API that the TextIOWrapper expects, so we'll
-                    # just consume the whole damn thing and decode it.
-                    # Fixed in werkzeug 0.15.
-                    stream = StringIO(file_obj.read().decode('utf8'))
-            else:
-                stream = file_obj.stream
-
             try:
+                # Here we need to translate the file stream. Werkzeug stores
+                # the upload in a temporary file opened in wb+ mode, which is
+                # not compatible with Python's CSV module, so we decode it as
+                # utf8 incrementally while it is read. The FileStorage is
+                # wrapped rather than its stream, since it provides the file
+                # API that a SpooledTemporaryFile lacks on older Pythons.
+                if not PY2:
+                    stream = TextIOWrapper(file_obj, encoding='utf8',
+                                           newline='')
+                else:
+                    stream = file_obj.stream
+
                 with dataset.transaction():
-                    count = dataset.thaw(
+                    count = dataset.thaw_batched(
                         table,
                         format=format,
                         file_obj=stream,
                         strict=strict)
             except Exception as exc:
+                # Columns added by the import were rolled back, but the
+                # dataset's cached model may still include them.
+                dataset.invalidate_schema()
                 flash('Error importing file: %s' % exc, 'danger')
                 app.logger.exception('Error importing file.')
             else:
+                dataset.invalidate_schema()  # Import may add new columns.
                 flash(
                     'Successfully imported %s objects from %s.' % (
                         count, file_obj.filename),
@@ -983,6 +1343,7 @@ def drop_table(table):
             flash('Error attempting to drop %s "%s".' % (label, table), 'danger')
             app.logger.exception('Error attempting to drop %s "%s".', label, table)
         else:
+            dataset.invalidate_schema()
             dataset.update_cache()  # Update all tables.
             flash('%s "%s" dropped successfully.' %
                   ('view' if is_view else 'table', table),
@@ -991,13 +1352,14 @@ def drop_table(table):
 
     return render_template('drop_table.html', is_view=is_view, table=table)
 
+index_on_re = re.compile(r'\bon\b', re.I)
+
 @app.template_filter('format_index')
 def format_index(index_sql):
-    split_regex = re.compile(r'\bon\b', re.I)
-    if not split_regex.search(index_sql):
+    if not index_on_re.search(index_sql):
         return index_sql
 
-    create, definition = split_regex.split(index_sql)
+    create, definition = index_on_re.split(index_sql)
     return '\nON '.join((create.strip(), definition.strip()))
 
 @app.template_filter('encode_pk')
@@ -1014,6 +1376,9 @@ def decode_pk(model, pk_data):
     if isinstance(pk, CompositeKey):
         fields = [pk.model._meta.columns[f] for f in pk.field_names]
         values = pk_data.split(':::')
+        if sqlite3.sqlite_version_info >= (3, 15, 0):
+            # Compare as a single row-value, e.g. (pk1, pk2) = (?, ?).
+            return Tuple(*fields) == Tuple(*values)
         expressions = [(f == v) for f, v in zip(fields, values)]
         return reduce(operator.and_, expressions)
     return (pk == pk_data)
@@ -1024,36 +1389,66 @@ def pk_display(table_pk, pk):
         return tuple(pk.split(':::'))
     return pk
 
+# Values that are rendered as-is by the value_filter.
+passthrough_types = numeric + (datetime.date, datetime.time, decimal.Decimal)
+
 @app.template_filter('value_filter')
 def value_filter(value, max_length=50):
-    if isinstance(value, numeric):
+    if value is None or isinstance(value, passthrough_types):
         return value
 
     if isinstance(value, binary_types):
-        if not isinstance(value, (bytes, bytearray)):
-            value = bytes(value)  # Handle `buffer` type.
-        value = base64.b64encode(value)[:1024].decode('utf8')
+        # Only encode the prefix that will be displayed. Slicing before the
+        # bytes() conversion also handles the `buffer` type.
+        value = bytes(value[:blob_preview_size])
+        value = base64.b64encode(value).decode('utf8')
     if isinstance(value, unicode_type):
-        value = escape(value)
+        # Truncate before escaping, so that the visible portion never ends
+        # in the middle of an HTML entity.
         if len(value) > max_length:
             return ('<span class="truncated">%s</span> '
                     '<span class="full" style="display:none;">%s</span>'
                     '<a class="toggle-value" href="#">...</a>') % (
-                        value[:max_length],
-                        value)
+                        escape(value[:max_length]),
+                        escape(value))
+        return escape(value)
     return value
 
-column_re = re.compile('(.+?)\((.+)\)', re.S)
-column_split_re = re.compile(r'(?:[^,(]|\([^)]*\))+')
-
 def _format_create_table(sql):
-    create_table, column_list = column_re.search(sql).groups()
-    columns = ['  %s' % column.strip()
-               for column in column_split_re.findall(column_list)
-               if column.strip()]
-    return '%s (\n%s\n)' % (
-        create_table,
-        ',\n'.join(columns))
+    # Split the column list on top-level commas in a single pass, tracking
+    # nested parentheses and quoted strings or identifiers.
+    start = sql.index('(')
+    columns = []
+    depth = 0
+    quote = None
+    last = start + 1
+    for idx in range(start + 1, len(sql)):
+        char = sql[idx]
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '[':
+            quote = ']'
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == ',' and depth == 0:
+            columns.append(sql[last:idx])
+            last = idx + 1
+    else:
+        raise ValueError('Unbalanced parentheses in table definition.')
+
+    columns.append(sql[last:idx])
+    return '%s (\n%s\n)%s' % (
+        sql[:start],
+        ',\n'.join('  %s' % column.strip() for column in columns
+                    if column.strip()),
+        sql[idx + 1:])
 
 @app.template_filter()
 def format_create_table(sql):
@@ -1066,15 +1461,32 @@ def format_create_table(sql):
 def highlight_filter(data):
     return Markup(syntax_highlight(data))
 
+_query_images_cache = {}
+
 def get_query_images():
-    accum = []
+    # Only re-scan the image directory when its contents have changed.
     image_dir = os.path.join(app.static_folder, 'img')
-    if not os.path.exists(image_dir):
-        return accum
-    for filename in sorted(os.listdir(image_dir)):
-        basename = os.path.splitext(os.path.basename(filename))[0]
-        parts = basename.split('-')
+    try:
+        mtime = os.stat(image_dir).st_mtime
+    except OSError:
+        return []
+    if mtime in _query_images_cache:
+        return _query_images_cache[mtime]
+
+    if hasattr(os, 'scandir'):
+        # scandir() provides the entry type without an additional stat().
+        filenames = [entry.name for entry in os.scandir(image_dir)
+                     if entry.is_file()]
+    else:
+        filenames = [filename for filename in os.listdir(image_dir)
+                     if os.path.isfile(os.path.join(image_dir, filename))]
+
+    accum = []
+    for filename in sorted(filenames):
+        parts = os.path.splitext(filename)[0].split('-')
         accum.append((parts, 'img/' + filename))
+    _query_images_cache.clear()
+    _query_images_cache[mtime] = accum
     return accum
 
 #
@@ -1094,111 +1506,118 @@ def _now():
 
 @app.before_request
 def _connect_db():
+    if request.endpoint == 'static':
+        return  # Static files do not need a connection.
     dataset.connect()
+    dataset.check_schema()
 
 @app.teardown_request
 def _close_db(exc):
     if not dataset._database.is_closed():
         dataset.close()
 
-
-class PrefixMiddleware(object):
-    def __init__(self, app, prefix):
-        self.app = app
-        self.prefix = '/%s' % prefix.strip('/')
-        self.prefix_len = len(self.prefix)
-
-    def __call__(self, environ, start_response):
-        if environ['PATH_INFO'].startswith(self.prefix):
-            environ['PATH_INFO'] = environ['PATH_INFO'][self.prefix_len:]
-            environ['SCRIPT_NAME'] = self.prefix
-            return self.app(environ, start_response)
-        else:
-            start_response('404', [('Content-Type', 'text/plain')])
-            return ['URL does not match application prefix.'.encode()]
-
 #
 # Script options.
 #
 
-def get_option_parser():
-    parser = optparse.OptionParser()
-    parser.add_option(
+_arg_parser = None
+
+def get_arg_parser():
+    # The parser is built once and re-used on subsequent calls.
+    global _arg_parser
+    if _arg_parser is not None:
+        return _arg_parser
+
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'database',
+        help='Path to SQLite database file.')
+    parser.add_argument(
         '-p',
         '--port',
         default=8080,
         help='Port for web interface, default=8080',
-        type='int')
-    parser.add_option(
+        type=int)
+    parser.add_argument(
         '-H',
         '--host',
         default='127.0.0.1',
         help='Host for web interface, default=127.0.0.1')
-    parser.add_option(
+    parser.add_argument(
         '-d',
         '--debug',
         action='store_true',
         help='Run server in debug mode')
-    parser.add_option(
+    parser.add_argument(
         '-x',
         '--no-browser',
         action='store_false',
         default=True,
         dest='browser',
         help='Do not automatically open browser page.')
-    parser.add_option(
+    parser.add_argument(
         '-l',
         '--log-file',
         dest='log_file',
         help='Filename for application logs.')
-    parser.add_option(
+    parser.add_argument(
         '-P',
         '--password',
         action='store_true',
         dest='prompt_password',
         help='Prompt for password to access database browser.')
-    parser.add_option(
+    parser.add_argument(
         '-r',
         '--read-only',
         action='store_true',
         dest='read_only',
         help='Open database in read-only mode.')
-    parser.add_option(
+    parser.add_argument(
         '-R',
         '--rows-per-page',
         default=50,
         dest='rows_per_page',
         help='Number of rows to display per page (default=50)',
-        type='int')
-    parser.add_option(
+        type=int)
+    parser.add_argument(
+        '-j',
+        '--journal-mode',
+        choices=('delete', 'truncate', 'persist', 'memory', 'wal', 'off'),
+        default='wal',
+        dest='journal_mode',
+        help='Journal mode for the database, default=wal. Not used in '
+             'read-only mode.',
+        type=str.lower)
+    parser.add_argument(
         '-u',
         '--url-prefix',
         dest='url_prefix',
         help='URL prefix for application.')
-    parser.add_option(
+    parser.add_argument(
         '-e',
         '--extension',
         action='append',
         dest='extensions',
         help='Path or name of loadable extension.')
-    ssl_opts = optparse.OptionGroup(parser, 'SSL options')
-    ssl_opts.add_option(
+    ssl_opts = parser.add_argument_group('SSL options')
+    ssl_opts.add_argument(
         '-c',
         '--ssl-cert',
         dest='ssl_cert',
         help='SSL certificate file path.')
-    ssl_opts.add_option(
+    ssl_opts.add_argument(
         '-k',
         '--ssl-key',
         dest='ssl_key',
         help='SSL private key file path.')
-    ssl_opts.add_option(
+    ssl_opts.add_argument(
         '-a',
         '--ad-hoc',
         action='store_true',
         dest='ssl_ad_hoc',
         help='Use ad-hoc SSL context.')
-    parser.add_option_group(ssl_opts)
+    _arg_parser = parser
     return parser
 
 def die(msg, exit_code=1):
@@ -1210,6 +1629,7 @@ def open_browser_tab(host, port):
     url = 'http://%s:%s/' % (host, port)
 
     def _open_tab(url):
+        import webbrowser
         time.sleep(1.5)
         webbrowser.open_new_tab(url)
 
@@ -1229,7 +1649,7 @@ def install_auth_handler(password):
             return redirect(url_for('login'))
 
 def initialize_app(filename, read_only=False, password=None, url_prefix=None,
-                   extensions=None):
+                   extensions=None, journal_mode='wal'):
     global dataset
     global migrator
 
@@ -1240,25 +1660,49 @@ def initialize_app(filename, read_only=False, password=None, url_prefix=None,
     if peewee_version >= (3, 14, 9):
         dataset_kw['include_views'] = True
 
+    # Use memory-mapped I/O and a large page-cache, since nearly every view
+    # issues several metadata queries.
+    pragmas = [
+        ('mmap_size', 1 << 28),  # 256MB.
+        ('cache_size', -64000),  # 64MB.
+        ('temp_store', 'memory')]
+
+    # Connections are pooled so that each request does not pay the cost of
+    # opening a connection and warming its page-cache. Pooled connections
+    # may be checked-out by any of the server's threads.
+    db_kw = {
+        'check_same_thread': False,
+        'max_connections': None,
+        'pragmas': pragmas,
+        'stale_timeout': 300}
+
     if read_only:
         if sys.version_info < (3, 4, 0):
             die('Python 3.4.0 or newer is required for read-only access.')
         if peewee_version < (3, 5, 1):
             die('Peewee 3.5.1 or newer is required for read-only access.')
-        db = SqliteDatabase('file:%s?mode=ro' % filename, uri=True)
+        db = PooledSqliteDatabase('file:%s?mode=ro' % filename, uri=True,
+                                  **db_kw)
         try:
             db.connect()
         except OperationalError:
             die('Unable to open database file in read-only mode. Ensure that '
                 'the database exists in order to use read-only mode.')
         db.close()
-        dataset = SqliteDataSet(db, bare_fields=True, **dataset_kw)
     else:
-        dataset = SqliteDataSet('sqlite:///%s' % filename, bare_fields=True,
-                                **dataset_kw)
+        # WAL-mode (the default) allows readers to proceed while a write is in
+        # progress. It does not apply to in-memory databases.
+        if journal_mode and filename != ':memory:':
+            pragmas.append(('journal_mode', journal_mode))
+            if journal_mode.lower() == 'wal':
+                pragmas.append(('synchronous', 'normal'))
+        db = PooledSqliteDatabase(filename, **db_kw)
+
+    dataset = SqliteDataSet(db, bare_fields=True, **dataset_kw)
 
     if url_prefix:
-        app.wsgi_app = PrefixMiddleware(app.wsgi_app, prefix=url_prefix)
+        prefix = '/%s' % url_prefix.strip('/')
+        app.wsgi_app = DispatcherMiddleware(NotFound(), {prefix: app.wsgi_app})
 
     if extensions:
         for ext in extensions:
@@ -1269,10 +1713,15 @@ def initialize_app(filename, read_only=False, password=None, url_prefix=None,
 
 def main():
     # This function exists to act as a console script entry-point.
-    parser = get_option_parser()
-    options, args = parser.parse_args()
-    if not args:
-        die('Error: missing required path to database file.')
+    options = get_arg_parser().parse_args()
+
+    # Check the database path before prompting for a password or setting up
+    # logging. A missing file is created, except in read-only mode.
+    if os.path.isdir(options.database):
+        die('Error: %s is a directory.' % options.database)
+    elif options.read_only and not os.path.exists(options.database):
+        die('Error: database file %s not found. Ensure that the database '
+            'exists in order to use read-only mode.' % options.database)
 
     if options.log_file:
         fmt = logging.Formatter('[%(asctime)s] - [%(levelname)s] - %(message)s')
@@ -1286,6 +1735,7 @@ def main():
         if os.environ.get('SQLITE_WEB_PASSWORD'):
             password = os.environ['SQLITE_WEB_PASSWORD']
         else:
+            from getpass import getpass
             while True:
                 password = getpass('Enter password: ')
                 password_confirm = getpass('Confirm password: ')
@@ -1298,15 +1748,14 @@ def main():
         app.config['ROWS_PER_PAGE'] = options.rows_per_page
 
     # Initialize the dataset instance and (optionally) authentication handler.
-    initialize_app(args[0], options.read_only, password, options.url_prefix,
-                   options.extensions)
+    initialize_app(options.database, options.read_only, password, options.url_prefix,
+                   options.extensions, options.journal_mode)
 
     if options.browser:
         open_browser_tab(options.host, options.port)
 
-    if password:
-        key = b'sqlite-web-' + args[0].encode('utf8') + password.encode('utf8')
-        app.secret_key = hashlib.sha256(key).hexdigest()
+    # Sign sessions with a random key, generated each time the server starts.
+    app.secret_key = os.urandom(32)
 
     # Set up SSL context, if specified.
     kwargs = {}